@@ -67,6 +67,38 @@ class CustomDataset(torch.utils.data.Dataset):
         
         return self.__getitem__(index)
     
+    def load_batch(self, flip=False):
+        """Stack all subjects into a single batch, padded to the longest subject.
+        Padded frames repeat the last frame and have all keypoints masked. Since the
+        network is causal, predictions of the valid frames are not affected by padding.
+        Subject ids and frame indices are returned as lists in subject order."""
+        
+        batch = [self.load_data(i, flip) for i in range(len(self))]
+        index, x, inits, features, mask, init_root, cam_angvel, frame_id, kwargs = zip(*batch)
+        n_frames = max(len(f) for f in frame_id)
+        
+        def pad(val, value=None):
+            # Pad (1, T, ...) tensor to (1, n_frames, ...) along the time axis
+            val = val[:, :n_frames]
+            tail = val[:, -1:].expand(-1, n_frames - val.shape[1], *val.shape[2:])
+            if value is not None: tail = torch.full_like(tail, value)
+            return torch.cat((val, tail), dim=1)
+        
+        return (
+            list(index),                                                    # subject ids
+            torch.cat([pad(val) for val in x]),                             # 2d keypoints
+            (torch.cat([val[0] for val in inits]),                          # initial pose
+             torch.cat([val[1] for val in inits])),
+            torch.cat([pad(val) for val in features]),                      # image features
+            torch.cat([pad(val, True) for val in mask]),                    # keypoints mask
+            torch.cat(init_root),                                           # initial root orientation
+            torch.cat([pad(val) for val in cam_angvel]),                    # camera angular velocity
+            list(frame_id),                                                 # frame indices
+            {'cam_intrinsics': torch.cat([val['cam_intrinsics'] for val in kwargs]),
+             'bbox': torch.cat([pad(val['bbox']) for val in kwargs]),
+             'res': torch.cat([val['res'] for val in kwargs])},
+            )
+    
     def __getitem__(self, _index):
         if _index >= len(self): return
         
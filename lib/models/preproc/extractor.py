@@ -30,7 +30,13 @@ class FeatureExtractor(object):
     
     def run(self, video, tracking_results, patch_h=256, patch_w=256):
         
-        if osp.isfile(video):
+        is_array = isinstance(video, np.ndarray)
+        if is_array:   # In-memory frames (T, H, W, 3)
+            cap = video
+            is_video = False
+            length = len(video)
+            height, width = video.shape[1:3]
+        elif osp.isfile(video):
             cap = cv2.VideoCapture(video)
             is_video = True
             length = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
@@ -51,7 +57,7 @@ class FeatureExtractor(object):
             else:
                 if frame_id >= len(cap):
                     break
-                img = cv2.imread(cap[frame_id])
+                img = cap[frame_id] if is_array else cv2.imread(cap[frame_id])
             
             for _id, val in tracking_results.items():
                 if not frame_id in val['frame_id']: continue
@@ -63,7 +69,7 @@ class FeatureExtractor(object):
                 norm_img, crop_img = process_image(img[..., ::-1], [cx, cy], scale, patch_h, patch_w)
                 norm_img = torch.from_numpy(norm_img).unsqueeze(0).to(self.device)
                 feature = self.model(norm_img, encode=True)
-                tracking_results[_id]['features'].append(feature.cpu())
+                tracking_results[_id]['features'].append(feature.float().cpu())
                 
                 if frame_id2 == 0: # First frame of this subject
                     tracking_results = self.predict_init(norm_img, tracking_results, _id, flip_eval=False)
@@ -77,7 +83,7 @@ class FeatureExtractor(object):
                     tracking_results[_id]['flipped_keypoints'].append(flipped_keypoints)
                     
                     flipped_features = self.model(torch.flip(norm_img, (3, )), encode=True)
-                    tracking_results[_id]['flipped_features'].append(flipped_features.cpu())
+                    tracking_results[_id]['flipped_features'].append(flipped_features.float().cpu())
                     
                     if frame_id2 == 0:
                         tracking_results = self.predict_init(torch.flip(norm_img, (3, )), tracking_results, _id, flip_eval=True)
@@ -91,9 +97,9 @@ class FeatureExtractor(object):
         prefix = 'flipped_' if flip_eval else ''
         
         pred_global_orient, pred_body_pose, pred_betas, _ = self.model(norm_img, encode=False)
-        tracking_results[_id][prefix + 'init_global_orient'] = pred_global_orient.cpu()
-        tracking_results[_id][prefix + 'init_body_pose'] = pred_body_pose.cpu()
-        tracking_results[_id][prefix + 'init_betas'] = pred_betas.cpu()
+        tracking_results[_id][prefix + 'init_global_orient'] = pred_global_orient.float().cpu()
+        tracking_results[_id][prefix + 'init_body_pose'] = pred_body_pose.float().cpu()
+        tracking_results[_id][prefix + 'init_betas'] = pred_betas.float().cpu()
         return tracking_results
     
     def process(self, tracking_results):
@@ -67,16 +67,18 @@ class Network(nn.Module):
         return feet_world, cam_R
     
     def forward_smpl(self, **kwargs):
-        self.output = self.smpl(self.pred_pose, 
-                                self.pred_shape,
-                                cam=self.pred_cam,
-                                return_full_pose=not self.training,
-                                **kwargs,
-                                )
-        
-        # Feet location in global coordinate
-        root_world, trans = rollout_global_motion(self.pred_root, self.pred_vel)
-        feet_world, cam_R = self.compute_global_feet(root_world, trans)
+        # Body model and kinematics always run in FP32, also when the network is under autocast
+        with torch.autocast(device_type=self.pred_pose.device.type, enabled=False):
+            self.output = self.smpl(self.pred_pose, 
+                                    self.pred_shape,
+                                    cam=self.pred_cam,
+                                    return_full_pose=not self.training,
+                                    **kwargs,
+                                    )
+            
+            # Feet location in global coordinate
+            root_world, trans = rollout_global_motion(self.pred_root, self.pred_vel)
+            feet_world, cam_R = self.compute_global_feet(root_world, trans)
         
         # Return output
         output = {'feet': feet_world,
@@ -122,12 +124,13 @@ class Network(nn.Module):
     
     
     def rollout(self, output, pred_root, pred_vel, return_y_up):
-        root_world, trans_world = rollout_global_motion(pred_root, pred_vel)
-        
-        if return_y_up:
-            yup2ydown = axis_angle_to_matrix(torch.tensor([[np.pi, 0, 0]])).float().to(root_world.device)
-            root_world = yup2ydown.mT @ root_world
-            trans_world = (yup2ydown.mT @ trans_world.unsqueeze(-1)).squeeze(-1)
+        with torch.autocast(device_type=pred_root.device.type, enabled=False):
+            root_world, trans_world = rollout_global_motion(pred_root.float(), pred_vel.float())
+            
+            if return_y_up:
+                yup2ydown = axis_angle_to_matrix(torch.tensor([[np.pi, 0, 0]])).float().to(root_world.device)
+                root_world = yup2ydown.mT @ root_world
+                trans_world = (yup2ydown.mT @ trans_world.unsqueeze(-1)).squeeze(-1)
             
         output.update({
             'poses_root_world': root_world,
@@ -140,7 +143,8 @@ class Network(nn.Module):
     def refine_trajectory(self, output, cam_angvel, return_y_up, **kwargs):
         
         # --------- Refine trajectory --------- #
-        update_vel = reset_root_velocity(self.smpl, self.output, self.pred_contact, self.pred_root, self.pred_vel, thr=0.5)
+        with torch.autocast(device_type=self.pred_vel.device.type, enabled=False):
+            update_vel = reset_root_velocity(self.smpl, self.output, self.pred_contact, self.pred_root, self.pred_vel, thr=0.5)
         output = self.trajectory_refiner(self.old_motion_context, update_vel, output, cam_angvel, return_y_up=return_y_up)
         # --------- #
         
@@ -177,14 +181,14 @@ class Network(nn.Module):
         pred_pose, pred_shape, pred_cam, pred_contact = self.motion_decoder(motion_context, init_smpl)
         # --------- #
         
-        # --------- Register predictions --------- #
-        self.pred_kp3d = pred_kp3d
-        self.pred_root = pred_root
-        self.pred_vel = pred_vel
-        self.pred_pose = pred_pose
-        self.pred_shape = pred_shape
-        self.pred_cam = pred_cam
-        self.pred_contact = pred_contact
+        # --------- Register predictions (FP32 under autocast) --------- #
+        self.pred_kp3d = pred_kp3d.float()
+        self.pred_root = pred_root.float()
+        self.pred_vel = pred_vel.float()
+        self.pred_pose = pred_pose.float()
+        self.pred_shape = pred_shape.float()
+        self.pred_cam = pred_cam.float()
+        self.pred_contact = pred_contact.float()
         # --------- #
         
         # --------- Build SMPL --------- #
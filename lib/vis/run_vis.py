@@ -9,14 +9,26 @@ from progress.bar import Bar
 
 from lib.vis.renderer import Renderer, get_global_cameras
 
-def run_vis_on_demo(cfg, video, results, output_pth, smpl, vis_global=True):
+def read_frames(cap):
+    while (cap.isOpened()):
+        flag, org_img = cap.read()
+        if not flag: break
+        yield org_img
+
+def run_vis_on_demo(cfg, video, results, output_pth, smpl, vis_global=True, fps=None):
     # to torch tensor
     tt = lambda x: torch.from_numpy(x).float().to(cfg.DEVICE)
     
-    cap = cv2.VideoCapture(video)
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    length = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    width, height = cap.get(cv2.CAP_PROP_FRAME_WIDTH), cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+    if isinstance(video, np.ndarray):
+        # In-memory BGR frames (T, H, W, 3); fps has to be given
+        frames = video
+        length, height, width = video.shape[:3]
+    else:
+        cap = cv2.VideoCapture(video)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        length = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        width, height = cap.get(cv2.CAP_PROP_FRAME_WIDTH), cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        frames = read_frames(cap)
     
     # create renderer with cliff focal length estimation
     focal_length = (width ** 2 + height ** 2) ** 0.5
@@ -56,9 +68,7 @@ def run_vis_on_demo(cfg, video, results, output_pth, smpl, vis_global=True):
     frame_i = 0
     _global_R, _global_T = None, None
     # run rendering
-    while (cap.isOpened()):
-        flag, org_img = cap.read()
-        if not flag: break
+    for org_img in frames:
         img = org_img[..., ::-1].copy()
         
         # render onto the input video
@@ -1,6 +1,7 @@
 import cv2
 import numpy as np
 import os
+import sys
 import tempfile
 import time
 import shutil
@@ -9,6 +10,9 @@ from queue import Queue
 from datetime import datetime
 from wham_api_2 import VideoProcessor
 
+# Upper bound on decoded output frames kept for display
+MAX_FRAMES = 50
+
 class WebcamProcessor:
     def __init__(self, webcam_id=0, clip_duration=1, fps=30, display_scale=0.7):
         self.webcam_id = webcam_id
@@ -16,17 +20,40 @@ class WebcamProcessor:
         self.target_fps = fps
         self.display_scale = display_scale
         
-        self.cap = cv2.VideoCapture(self.webcam_id)
+        # V4L2 on Linux with MJPG from the camera and a 1-frame driver queue to keep latency low
+        backend = cv2.CAP_V4L2 if sys.platform.startswith('linux') else cv2.CAP_ANY
+        self.cap = cv2.VideoCapture(self.webcam_id, backend)
+        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
         self.frame_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         self.frame_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         
-        self.frames_buffer = []
+        # Pre-allocated ring of 1 second clip + 1 extra second buffer; frames are read in place
+        self.ring_size = self.target_fps * (self.clip_duration + 1)
+        self.ring = np.empty((self.ring_size, self.frame_height, self.frame_width, 3), dtype=np.uint8)
+        self.write_idx = 0
         self.processing_queue = Queue(maxsize=2)
+        self.clip_ready = threading.Event()
         self.current_output = None
+        
+        # Double-buffered output frames: the worker decodes into the back buffer,
+        # then swaps it in under the lock while the display reads the front one
+        n_output = min(MAX_FRAMES, self.target_fps * self.clip_duration)
+        self._out_buffers = [np.empty((n_output, self.frame_height, self.frame_width, 3), dtype=np.uint8) for _ in range(2)]
+        self._back = 0
+        self._output_lock = threading.Lock()
         self.running = False
         self.current_temp_dir = None
         self.live_overlay = None
         
+        # Scratch buffers for the display loop, reused every iteration via cv2.resize(dst=...)
+        self.overlay_size = (int(self.frame_width * 0.3), int(self.frame_height * 0.3))
+        self.display_size = (int(self.frame_width * 2 * self.display_scale), int(self.frame_height * self.display_scale))
+        self._canvas = np.zeros((self.frame_height, self.frame_width * 2, 3), dtype=np.uint8)
+        self._overlay_buf = np.empty((self.overlay_size[1], self.overlay_size[0], 3), dtype=np.uint8)
+        self._output_buf = np.empty((self.frame_height, self.frame_width, 3), dtype=np.uint8)
+        self._final = np.empty((self.display_size[1], self.display_size[0], 3), dtype=np.uint8)
+        
         # Initialize WHAM processor
         self.wham_processor = VideoProcessor(
             visualize=True,
@@ -40,108 +67,132 @@ class WebcamProcessor:
         threading.Thread(target=self._process_clips, daemon=True).start()
         self._display_loop()
 
+    def _pin_current_thread(self, offset):
+        # Keep capture / display on their own cores (the last ones) so they do
+        # not bounce the inference threads' caches. Linux only, needs >= 4 cores.
+        n_cores = os.cpu_count() or 1
+        if hasattr(os, 'sched_setaffinity') and n_cores >= 4:
+            os.sched_setaffinity(0, {n_cores - 1 - offset})
+
     def _capture_frames(self):
+        self._pin_current_thread(0)
         while self.running:
-            ret, frame = self.cap.read()
+            # Decode straight into the next ring slot
+            slot = self.write_idx % self.ring_size
+            ret, _ = self.cap.read(self.ring[slot])
             if not ret:
                 continue
                 
-            # Store frame and live overlay
-            self.frames_buffer.append(frame)
-            self.live_overlay = frame.copy()
+            # Publish frame and live overlay
+            self.write_idx += 1
+            self.live_overlay = self.ring[slot]
             
-            # Maintain buffer for 1 second + 1 extra second buffer
-            if len(self.frames_buffer) > self.target_fps * (self.clip_duration + 1):
-                self.frames_buffer.pop(0)
+            # Wake up the clip dispatcher once a full clip is buffered and WHAM is idle
+            if self._num_buffered() >= self.target_fps * self.clip_duration and not self.wham_processor.is_running():
+                self.clip_ready.set()
+
+    def _num_buffered(self):
+        return min(self.write_idx, self.ring_size)
+
+    def _latest_frame(self):
+        return self.ring[(self.write_idx - 1) % self.ring_size]
 
     def _create_clip(self):
-        # Get last N frames for 1 second clip
-        clip_frames = self.frames_buffer[-self.target_fps * self.clip_duration:]
-        
-        # Create temp directory
-        temp_dir = tempfile.mkdtemp(prefix="wham_clip_")
-        input_path = os.path.join(temp_dir, "input.mp4")
-        
-        # Save clip
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(
-            input_path, 
-            fourcc, 
-            self.target_fps, 
-            (self.frame_width, self.frame_height)
-        )
-        
-        for frame in clip_frames:
-            out.write(frame)
-        out.release()
-        
-        return temp_dir, input_path
+        # Gather last N frames for 1 second clip. This copies them out of the
+        # ring, which keeps being overwritten while WHAM runs on the clip.
+        n_frames = self.target_fps * self.clip_duration
+        end = self.write_idx
+        clip_slots = [i % self.ring_size for i in range(end - n_frames, end)]
+        return self.ring[clip_slots]
 
     def _process_clips(self):
         while self.running:
-            if self.processing_queue.empty() and len(self.frames_buffer) >= self.target_fps * self.clip_duration:
-                temp_dir, input_path = self._create_clip()
-                output_dir = os.path.join(temp_dir, "output")
-                os.makedirs(output_dir, exist_ok=True)
-                
-                self.processing_queue.put({
-                    'temp_dir': temp_dir,
-                    'input_path': input_path,
-                    'output_dir': output_dir,
-                    'timestamp': datetime.now()
-                })
-                
-                # Process in background
-                self.wham_processor.process_video(
-                    input_path,
-                    output_pth=output_dir,
-                    callback=lambda success, out, err: self._processing_done(temp_dir, success)
-                )
-            time.sleep(0.1)
+            if not self.clip_ready.wait(timeout=1.0):
+                continue
+            self.clip_ready.clear()
+            if not self.processing_queue.empty():
+                continue
+            
+            clip_frames = self._create_clip()
+            
+            # Temp directory for the rendered output only, input stays in memory
+            temp_dir = tempfile.mkdtemp(prefix="wham_clip_")
+            
+            self.processing_queue.put({
+                'temp_dir': temp_dir,
+                'timestamp': datetime.now()
+            })
+            
+            # Process in background
+            self.wham_processor.process_frames(
+                clip_frames,
+                self.target_fps,
+                output_pth=temp_dir,
+                callback=lambda success, out, err, temp_dir=temp_dir: self._processing_done(temp_dir, success)
+            )
 
     def _processing_done(self, temp_dir, success):
-        if success:
-            output_path = os.path.join(temp_dir, "output", "input_vis.mp4")
-            if os.path.exists(output_path):
-                self.current_output = self._load_output_video(output_path)
-        shutil.rmtree(temp_dir, ignore_errors=True)
+        try:
+            if success:
+                output_path = os.path.join(temp_dir, "output.mp4")
+                if os.path.exists(output_path):
+                    frames = self._load_output_video(output_path, self._out_buffers[self._back])
+                    if len(frames):
+                        with self._output_lock:
+                            self.current_output = frames
+                        self._back ^= 1
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        finally:
+            # Always free the dispatch slot, otherwise _process_clips stops for good
+            self.processing_queue.get_nowait()
 
-    def _load_output_video(self, path):
+    def _load_output_video(self, path, out=None):
         cap = cv2.VideoCapture(path)
-        frames = []
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            frames.append(frame)
+        max_frames = MAX_FRAMES if out is None else len(out)
+        n_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        # Some containers do not report a frame count; then read up to the cap
+        n_frames = min(n_frames, max_frames) if n_frames > 0 else max_frames
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        
+        # Decode in place into the given buffer, or a new contiguous array if the resolution differs
+        frames = out
+        if frames is None or frames.shape[1:3] != (height, width):
+            frames = np.empty((n_frames, height, width, 3), dtype=np.uint8)
+        i = 0
+        while i < n_frames and cap.read(frames[i])[0]:
+            i += 1
         cap.release()
-        return frames
+        return frames[:i]
 
     def _display_loop(self):
+        self._pin_current_thread(1)
+        display_frame = self._canvas
         while self.running:
-            # Create main display frame
-            display_frame = np.zeros((self.frame_height, self.frame_width * 2, 3), dtype=np.uint8)
-            
             # Show live overlay (top-left corner)
             if self.live_overlay is not None:
-                overlay = cv2.resize(self.live_overlay, (0,0), fx=0.3, fy=0.3)
+                overlay = cv2.resize(self.live_overlay, self.overlay_size, dst=self._overlay_buf)
                 h, w = overlay.shape[:2]
                 display_frame[:h, :w] = overlay
             
             # Show processed output
-            if self.current_output is not None:
-                current_frame_idx = min(int(time.time() * self.target_fps) % len(self.current_output), len(self.current_output)-1)
-                processed_frame = self.current_output[current_frame_idx]
+            with self._output_lock:
+                current_output = self.current_output
+            if current_output is not None:
+                current_frame_idx = int(time.time() * self.target_fps) % len(current_output)
+                processed_frame = current_output[current_frame_idx]
                 
-                # Resize to match original dimensions
-                processed_frame = cv2.resize(processed_frame, (self.frame_width, self.frame_height))
+                # Resize to match original dimensions (rendered output usually already does)
+                if processed_frame.shape[:2] != (self.frame_height, self.frame_width):
+                    processed_frame = cv2.resize(processed_frame, (self.frame_width, self.frame_height), dst=self._output_buf)
                 
                 # Combine input and output
-                display_frame[:, :self.frame_width] = self.frames_buffer[-1] if self.frames_buffer else np.zeros_like(display_frame[:, :self.frame_width])
+                if self._num_buffered():
+                    display_frame[:, :self.frame_width] = self._latest_frame()
                 display_frame[:, self.frame_width:] = processed_frame
             
             # Resize for display
-            final_display = cv2.resize(display_frame, (0,0), fx=self.display_scale, fy=self.display_scale)
+            final_display = cv2.resize(display_frame, self.display_size, dst=self._final)
             cv2.imshow('WHAM Real-time Processing', final_display)
             
             if cv2.waitKey(1) & 0xFF == ord('q'):
@@ -3,8 +3,10 @@ import sys
 import time
 import colorsys
 import argparse
+import threading
 import os.path as osp
 from glob import glob
+from queue import Queue, Full
 from collections import defaultdict
 
 import cv2
@@ -17,6 +19,8 @@ from loguru import logger
 
 from configs.config import get_cfg_defaults
 from lib.data.datasets import CustomDataset
+from lib.utils.imutils import avg_preds
+from lib.utils.transforms import matrix_to_axis_angle
 from lib.models import build_network, build_body_model
 from lib.models.preproc.detector import DetectionModel
 from lib.models.preproc.extractor import FeatureExtractor
@@ -42,24 +46,68 @@ def load_video(video):
 
     return cap, fps, length, width, height
 
+def prefetch(cap, size=8):
+    # Decode the next frames in a background thread while the caller runs detection.
+    # The worker owns cap and stops (releasing it) once the consumer goes away.
+    queue = Queue(maxsize=size)
+    stop = threading.Event()
+    
+    def put(item):
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+    
+    def worker():
+        try:
+            while cap.isOpened() and not stop.is_set():
+                flag, img = cap.read()
+                if not flag or not put(img): break
+        finally:
+            cap.release()
+            put(None)
+    threading.Thread(target=worker, daemon=True).start()
+    
+    try:
+        while True:
+            img = queue.get()
+            if img is None: break
+            yield img
+    finally:
+        stop.set()
+
 
 class WHAM_API(object):
-    def __init__(self):
+    def __init__(self, compile_network=False):
         self.cfg = prepare_cfg()
         self.network = build_network(self.cfg, build_body_model(self.cfg.DEVICE, self.cfg.TRAIN.BATCH_SIZE * self.cfg.DATASET.SEQLEN))
         self.network.eval()
+        # Only for callers whose batches keep the same shape on every call, from one thread: the network
+        # loops over frames, and load_batch pads to the longest tracked subject, so every new number of
+        # subjects or frames recompiles. CUDA graphs then replay the steady-state shape (PyTorch >= 2.0 only).
+        self.forward = self.network
+        if compile_network and hasattr(torch, 'compile'):
+            self.forward = torch.compile(self.network, mode='reduce-overhead', dynamic=False)
         self.detector = DetectionModel(self.cfg.DEVICE.lower())
-        self.extractor = FeatureExtractor(self.cfg.DEVICE.lower())
+        self.extractor = FeatureExtractor(self.cfg.DEVICE.lower(), self.cfg.FLIP_EVAL)
         self.slam = None
+        
+        # Mixed precision for the feature extractor and WHAM network (BF16 on Ampere+, FP16 otherwise)
+        self.use_amp = self.cfg.DEVICE.lower() == 'cuda' and torch.cuda.is_available()
+        self.amp_dtype = torch.bfloat16 if self.use_amp and torch.cuda.is_bf16_supported() else torch.float16
+        torch.backends.cuda.matmul.allow_tf32 = True
+        torch.backends.cudnn.allow_tf32 = True
     
     @torch.no_grad()
-    def preprocessing(self, video, cap, fps, length, output_dir):
-        if not (osp.exists(osp.join(output_dir, 'tracking_results.pth')) and 
+    def preprocessing(self, video, frames, fps, length, output_dir, persist=True):
+        if not (persist and osp.exists(osp.join(output_dir, 'tracking_results.pth')) and 
                 osp.exists(osp.join(output_dir, 'slam_results.pth'))):
-            while (cap.isOpened()):
-                flag, img = cap.read()
-                if not flag: break
-                
+            # Reset tracker state left over from the previous video
+            self.detector.initialize_tracking()
+            for img in frames:
                 # 2D detection and tracking
                 self.detector.track(img, fps, length)
                 
@@ -77,10 +125,12 @@ class WHAM_API(object):
         
             # Extract image features
             # TODO: Merge this into the previous while loop with an online bbox smoothing.
-            tracking_results = self.extractor.run(video, tracking_results)
+            with torch.autocast(device_type='cuda', dtype=self.amp_dtype, enabled=self.use_amp):
+                tracking_results = self.extractor.run(video, tracking_results)
             # Save the processed data
-            joblib.dump(tracking_results, osp.join(output_dir, 'tracking_results.pth'))
-            joblib.dump(slam_results, osp.join(output_dir, 'slam_results.pth'))
+            if persist:
+                joblib.dump(tracking_results, osp.join(output_dir, 'tracking_results.pth'))
+                joblib.dump(slam_results, osp.join(output_dir, 'slam_results.pth'))
         
         # If the processed data already exists, load the processed data
         else:
@@ -89,48 +139,90 @@ class WHAM_API(object):
 
         return tracking_results, slam_results
     
-    @torch.no_grad()
-    def wham_inference(self, tracking_results, slam_results, width, height, fps, output_dir):
+    @torch.inference_mode()
+    def wham_inference(self, tracking_results, slam_results, width, height, fps, output_dir, persist=True):
         # Build dataset
         dataset = CustomDataset(self.cfg, tracking_results, slam_results, width, height, fps)
         
         # run WHAM
         results = defaultdict(dict)
-        for batch in dataset:
-            if batch is None: break
-
-            _id, x, inits, features, mask, init_root, cam_angvel, frame_id, kwargs = batch
+        if len(dataset) > 0:
+            # All subjects in a single forward pass
+            with torch.autocast(device_type='cuda', dtype=self.amp_dtype, enabled=self.use_amp):
+                if self.cfg.FLIP_EVAL:
+                    # Forward pass with flipped input
+                    _, x, inits, features, mask, init_root, cam_angvel, _, kwargs = dataset.load_batch(flip=True)
+                    flipped_pred = self.forward(x, inits, features, mask=mask, init_root=init_root, cam_angvel=cam_angvel, return_y_up=True, **kwargs)
+                    # Copy out what is merged later; a compiled network reuses its output buffers on the next call
+                    flipped_pred = {k: flipped_pred[k].clone() for k in ['pose', 'betas', 'contact']}
+                
+                # Forward pass with normal input
+                ids, x, inits, features, mask, init_root, cam_angvel, frame_ids, kwargs = dataset.load_batch()
+                pred = self.forward(x, inits, features, mask=mask, init_root=init_root, cam_angvel=cam_angvel, return_y_up=True, **kwargs)
+            
+            if self.cfg.FLIP_EVAL:
+                # Merge two predictions (same as demo.py, over all subjects and frames at once)
+                flipped_pose, flipped_shape = flipped_pred['pose'].reshape(-1, 24, 6), flipped_pred['betas'].reshape(-1, 10)
+                pose, shape = pred['pose'].reshape(-1, 24, 6), pred['betas'].reshape(-1, 10)
+                avg_pose, avg_shape = avg_preds(pose, shape, flipped_pose, flipped_shape)
+                avg_contact = (flipped_pred['contact'][..., [2, 3, 0, 1]] + pred['contact']) / 2
+                
+                # Refine trajectory with merged prediction
+                self.network.pred_pose = avg_pose.reshape_as(self.network.pred_pose)
+                self.network.pred_shape = avg_shape.reshape_as(self.network.pred_shape)
+                self.network.pred_contact = avg_contact.reshape_as(self.network.pred_contact)
+                output = self.network.forward_smpl(**kwargs)
+                pred = self.network.refine_trajectory(output, cam_angvel, return_y_up=True)
+            
+            # SMPL outputs are flattened over (subject, frame)
+            n_subjs, n_frames = x.shape[:2]
+            unflatten = lambda val: val.reshape(n_subjs, n_frames, -1)
             
-            # inference
-            pred = self.network(x, inits, features, mask=mask, init_root=init_root, cam_angvel=cam_angvel, return_y_up=True, **kwargs)
+            # Convert on the device and pack everything into one tensor, so there is a single device-to-host copy
+            pred_body_pose = unflatten(matrix_to_axis_angle(pred['poses_body']))
+            pred_root = unflatten(matrix_to_axis_angle(pred['poses_root_cam']))
+            pred_root_world = unflatten(matrix_to_axis_angle(pred['poses_root_world']))
+            pred_trans = unflatten(pred['trans_cam'] - self.network.output.offset)
+            pred_verts = unflatten(pred['verts_cam'] + pred['trans_cam'].unsqueeze(1))
+            fields = {
+                'pose': torch.cat((pred_root, pred_body_pose), dim=-1),
+                'trans': pred_trans,
+                'pose_world': torch.cat((pred_root_world, pred_body_pose), dim=-1),
+                'trans_world': unflatten(pred['trans_world']),
+                'betas': unflatten(pred['betas']),
+                'verts': pred_verts,
+            }
+            packed = torch.cat(list(fields.values()), dim=-1).cpu().numpy()
+            packed = np.split(packed, np.cumsum([val.shape[-1] for val in fields.values()])[:-1], axis=-1)
             
-            # Store results
-            results[_id]['poses_body'] = pred['poses_body'].cpu().squeeze(0).numpy()
-            results[_id]['poses_root_cam'] = pred['poses_root_cam'].cpu().squeeze(0).numpy()
-            results[_id]['betas'] = pred['betas'].cpu().squeeze(0).numpy()
-            results[_id]['verts_cam'] = (pred['verts_cam'] + pred['trans_cam'].unsqueeze(1)).cpu().numpy()
-            results[_id]['poses_root_world'] = pred['poses_root_world'].cpu().squeeze(0).numpy()
-            results[_id]['trans_world'] = pred['trans_world'].cpu().squeeze(0).numpy()
-            results[_id]['frame_id'] = frame_id
+            for b, (_id, frame_id) in enumerate(zip(ids, frame_ids)):
+                T = len(frame_id)
+                
+                # Store results (same layout as demo.py so that run_vis_on_demo can consume it)
+                for key, val in zip(fields.keys(), packed):
+                    results[_id][key] = val[b, :T]
+                results[_id]['verts'] = results[_id]['verts'].reshape(T, -1, 3)
+                results[_id]['frame_ids'] = frame_id
         
-        joblib.dump(slam_results, osp.join(output_dir, 'wham_results.pth'))
+        if persist:
+            joblib.dump(slam_results, osp.join(output_dir, 'wham_results.pth'))
         return results
     
     @torch.no_grad()
-    def __call__(self, video, output_dir='output/demo', calib=None, run_global=True, visualize=False):
+    def __call__(self, video, output_dir='output/demo', calib=None, run_global=True, visualize=False, persist=True):
         # load video information
         cap, fps, length, width, height = load_video(video)
         os.makedirs(output_dir, exist_ok=True)
 
         # Whether or not estimating motion in global coordinates
         run_global = run_global and _run_global
-        if run_global: self.slam = SLAMModel(video, output_dir, width, height, calib)
+        self.slam = SLAMModel(video, output_dir, width, height, calib) if run_global else None
         
         # preprocessing to get detection, tracking, slam results and image features from video input
-        tracking_results, slam_results = self.preprocessing(video, cap, fps, length, output_dir)
+        tracking_results, slam_results = self.preprocessing(video, prefetch(cap), fps, length, output_dir, persist)
 
         # WHAM forward inference to get the results
-        results = self.wham_inference(tracking_results, slam_results, width, height, fps, output_dir)
+        results = self.wham_inference(tracking_results, slam_results, width, height, fps, output_dir, persist)
         
         # Visualize
         if visualize:
@@ -138,6 +230,28 @@ class WHAM_API(object):
             run_vis_on_demo(self.cfg, video, results, output_dir, self.network.smpl, vis_global=run_global)
         
         return results, tracking_results, slam_results
+    
+    @torch.no_grad()
+    def process_frames(self, frames, fps, width, height, output_dir='output/demo', visualize=False, persist=False):
+        """Run WHAM on in-memory BGR frames of shape (T, H, W, 3) without a video file roundtrip.
+        SLAM reads its input from a video file, so motion is only estimated in camera coordinates.
+        Intermediate results are not written to output_dir unless persist is set."""
+        length = len(frames)
+        os.makedirs(output_dir, exist_ok=True)
+        self.slam = None
+        
+        # preprocessing to get detection, tracking results and image features from the frames
+        tracking_results, slam_results = self.preprocessing(frames, frames, fps, length, output_dir, persist)
+
+        # WHAM forward inference to get the results
+        results = self.wham_inference(tracking_results, slam_results, width, height, fps, output_dir, persist)
+        
+        # Visualize
+        if visualize:
+            from lib.vis.run_vis import run_vis_on_demo
+            run_vis_on_demo(self.cfg, frames, results, output_dir, self.network.smpl, vis_global=False, fps=fps)
+        
+        return results, tracking_results, slam_results
 
 
 if __name__ == '__main__':
@@ -1,112 +1,180 @@
-import subprocess
+import os
+import os.path as osp
 import threading
+import traceback
 from pathlib import Path
 
+import joblib
+
+from wham_api import WHAM_API
+
 class VideoProcessor:
     def __init__(
         self,
-        wham_dir: str = "/home/ayush22126/WHAM",
-        python_exec: str = "/home/ayush22126/miniconda3/envs/wham/bin/python",
-        output_pth: str = None,
+        output_pth: str = "output/demo",
         calib: str = None,
         estimate_local_only: bool = False,
         visualize: bool = True,
         save_pkl: bool = False,
-        run_smplify: bool = False
+        run_smplify: bool = False,
+        compile_network: bool = False
     ):
         """
         Initialize the VideoProcessor with WHAM configuration and parameters.
 
+        The WHAM models are loaded once here and stay resident, so every
+        processed video is a direct method call instead of a fresh demo.py run.
+        Must be created from the WHAM repository root (relative config paths).
+
         Args:
-            wham_dir (str): Path to the WHAM repository directory.
-            python_exec (str): Path to the Python executable in the WHAM environment.
             output_pth (str, optional): Default output directory for results.
             calib (str, optional): Path to camera calibration file.
             estimate_local_only (bool): Only estimate local motion if True.
             visualize (bool): Enable visualization of the output mesh.
             save_pkl (bool): Save output as a .pkl file.
-            run_smplify (bool): Run Temporal SMPLify for post-processing.
+            run_smplify (bool): Run Temporal SMPLify for post-processing. Videos are then
+                processed per subject by demo.run, which always saves and reuses the
+                intermediate results. Not supported for in-memory frames.
+            compile_network (bool): torch.compile the network. Only pays off when
+                every call has the same number of subjects and tracked frames and
+                runs in the same thread, so not with process_video or process_frames.
         """
-        self.wham_dir = wham_dir
-        self.python_exec = python_exec
         self.output_pth = output_pth
         self.calib = calib
         self.estimate_local_only = estimate_local_only
         self.visualize = visualize
         self.save_pkl = save_pkl
         self.run_smplify = run_smplify
+        # Flip evaluation (cfg.FLIP_EVAL in configs/yamls/demo.yaml) is applied by WHAM_API as in demo.py
 
-        self.completed = False
+        self.api = WHAM_API(compile_network=compile_network)
+
+        self.completed = True
         self.success = False
         self.output = ""
         self.error = ""
+        self.results = None
         self.thread = None
         self.completion_event = threading.Event()
+        self.completion_event.set()    # Nothing running yet, consistent with self.completed
 
-    def process_video(self, video_path: str, callback: callable = None) -> None:
+    def process_video(self, video_path: str, output_pth: str = None, callback: callable = None) -> None:
         """
         Start processing the video in a background thread.
 
         Args:
             video_path (str): Path to the input video file.
+            output_pth (str, optional): Output directory, defaults to self.output_pth.
             callback (callable, optional): Function to call upon completion.
                 Signature: callback(success: bool, output: str, error: str)
         """
         if not Path(video_path).exists():
             raise FileNotFoundError(f"Video file not found: {video_path}")
 
+        self._start(self._run_video, (video_path, output_pth or self.output_pth), callback)
+
+    def process_video_sync(self, video_path: str, output_pth: str = None, persist: bool = True) -> tuple:
+        """
+        Process the video in the calling thread, without the worker thread and completion event.
+
+        Args:
+            video_path (str): Path to the input video file.
+            output_pth (str, optional): Output directory, defaults to self.output_pth.
+            persist (bool): Save and reuse the intermediate tracking, SLAM and WHAM results.
+
+        Returns:
+            tuple: (success: bool, output: str, error: str), where output is the
+                directory holding the results.
+        """
+        if not Path(video_path).exists():
+            raise FileNotFoundError(f"Video file not found: {video_path}")
+
+        success, output, error, _ = self._execute(self._run_video, (video_path, output_pth or self.output_pth, persist))
+        return success, output, error
+
+    def process_frames(self, frames, fps: float, output_pth: str = None, callback: callable = None) -> None:
+        """
+        Start processing in-memory frames in a background thread.
+
+        Args:
+            frames (np.ndarray): BGR frames of shape (T, H, W, 3).
+            fps (float): Frame rate of the frames.
+            output_pth (str, optional): Output directory, defaults to self.output_pth.
+            callback (callable, optional): Function to call upon completion.
+                Signature: callback(success: bool, output: str, error: str)
+        """
+        if self.run_smplify:
+            raise ValueError("Temporal SMPLify is not supported for in-memory frames")
+
+        self._start(self._run_frames, (frames, fps, output_pth or self.output_pth), callback)
+
+    def _start(self, target: callable, args: tuple, callback: callable) -> None:
+        """Internal method to launch a WHAM run in the worker thread."""
         self.completed = False
         self.success = False
         self.completion_event.clear()
 
         self.thread = threading.Thread(
             target=self._run_command,
-            args=(video_path, callback),
+            args=(target, args, callback),
             daemon=True
         )
         self.thread.start()
 
-    def _run_command(self, video_path: str, callback: callable) -> None:
-        """Internal method to execute the WHAM command."""
+    def _run_video(self, video_path: str, output_pth: str, persist: bool = True) -> tuple:
+        # Same output layout as demo.py: <output_pth>/<video name>
+        sequence = '.'.join(osp.basename(video_path).split('.')[:-1])
+        output_dir = osp.join(output_pth, sequence)
+
+        if self.run_smplify:
+            if not persist:
+                raise ValueError("Temporal SMPLify always saves intermediate results; persist=False is not supported")
+            # SMPLify fits each subject separately, so run the demo.py pipeline on the resident network
+            from demo import run
+            os.makedirs(output_dir, exist_ok=True)
+            results = run(
+                self.api.cfg, video_path, output_dir, self.api.network, self.calib,
+                run_global=not self.estimate_local_only,
+                visualize=self.visualize,
+                run_smplify=True
+            )
+            return results, output_dir
+
+        results, _, _ = self.api(
+            video_path,
+            output_dir=output_dir,
+            calib=self.calib,
+            run_global=not self.estimate_local_only,
+            visualize=self.visualize,
+            persist=persist
+        )
+        return results, output_dir
+
+    def _run_frames(self, frames, fps: float, output_dir: str) -> tuple:
+        height, width = frames.shape[1:3]
+        results, _, _ = self.api.process_frames(
+            frames, fps, width, height,
+            output_dir=output_dir,
+            visualize=self.visualize,
+            persist=False
+        )
+        return results, output_dir
+
+    def _execute(self, target: callable, args: tuple) -> tuple:
+        """Internal method to run WHAM on the resident model."""
         try:
-            command = [
-                self.python_exec,
-                "demo.py",
-                "--video", video_path
-            ]
-
-            if self.output_pth:
-                command.extend(["--output_pth", self.output_pth])
-            if self.calib:
-                command.extend(["--calib", self.calib])
-            if self.estimate_local_only:
-                command.append("--estimate_local_only")
-            if self.visualize:
-                command.append("--visualize")
+            results, output_dir = target(*args)
             if self.save_pkl:
-                command.append("--save_pkl")
-            if self.run_smplify:
-                command.append("--run_smplify")
-
-            result = subprocess.run(
-                command,
-                cwd=self.wham_dir,
-                capture_output=True,
-                text=True,
-                check=True
-            )
+                joblib.dump(results, osp.join(output_dir, "wham_output.pkl"))
+            return True, output_dir, "", results
 
-            self.output = result.stdout
-            self.error = result.stderr
-            self.success = True
-
-        except subprocess.CalledProcessError as e:
-            self.output = e.stdout
-            self.error = e.stderr
-            self.success = False
-        except Exception as e:
-            self.error = str(e)
-            self.success = False
+        except Exception:
+            return False, "", traceback.format_exc(), None
+
+    def _run_command(self, target: callable, args: tuple, callback: callable) -> None:
+        """Internal method to run WHAM and signal completion from the worker thread."""
+        try:
+            self.success, self.output, self.error, self.results = self._execute(target, args)
         finally:
             self.completed = True
             self.completion_event.set()
@@ -1,30 +1,125 @@
-from flask import Flask, request, send_file
+from quart import Quart, Response, request
+import asyncio
 import tempfile
+import shutil
 import os
+import atexit
 from wham_api_2 import VideoProcessor
 
-app = Flask(__name__)
+# Reusable working directories on tmpfs (RAM-backed), one per concurrent request.
+# The pool root is private to this process, so several server workers never share slots.
+POOL_SIZE = 4
+POOL_ROOT = tempfile.mkdtemp(dir='/dev/shm' if os.path.isdir('/dev/shm') else None, prefix='wham_')
+atexit.register(shutil.rmtree, POOL_ROOT, ignore_errors=True)
+CHUNK_SIZE = 64 * 1024
+
+app = Quart(__name__)
+# Quart defaults to a 16 MB upload limit and 60 s body/response timeouts; like Flask, accept any video size
+app.config['MAX_CONTENT_LENGTH'] = None
+app.config['BODY_TIMEOUT'] = None
+app.config['RESPONSE_TIMEOUT'] = None
 wham_processor = VideoProcessor(visualize=True)
 
+# Both are awaited on the event loop, so waiting requests never hold an executor thread
+slots = None
+gpu_lock = None
+
+@app.before_serving
+async def create_pool():
+    global slots, gpu_lock
+    slots = asyncio.Queue()
+    for i in range(POOL_SIZE):
+        slot = os.path.join(POOL_ROOT, str(i))
+        os.makedirs(slot, exist_ok=True)
+        slots.put_nowait(slot)
+    # One WHAM job on the GPU at a time; other requests queue here instead of competing for VRAM
+    gpu_lock = asyncio.Lock()
+
+def release_slot(temp_dir):
+    shutil.rmtree(os.path.join(temp_dir, 'output'), ignore_errors=True)
+    video_path = os.path.join(temp_dir, 'input.mp4')
+    if os.path.exists(video_path):
+        os.remove(video_path)
+    slots.put_nowait(temp_dir)
+
+async def run_wham(video_path, output_dir):
+    """Run WHAM in a worker thread while holding the GPU lock. The lock is released when the
+    thread returns, not when the awaiting request goes away, since a thread cannot be cancelled."""
+    await gpu_lock.acquire()
+    # Nothing is reused across requests, so never load cached results from a recycled slot
+    job = asyncio.ensure_future(asyncio.to_thread(
+        wham_processor.process_video_sync, video_path, output_pth=output_dir, persist=False))
+    job.add_done_callback(lambda _: gpu_lock.release())
+    return job
+
+class SlotStream:
+    """Response body streaming a file from a slot. The slot is released exactly once, when the
+    body is exhausted or closed, or when it is garbage collected without ever being iterated."""
+    def __init__(self, path, temp_dir):
+        self.file = open(path, 'rb')
+        self.temp_dir = temp_dir
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        # The file lives on tmpfs, so reading it on the event loop does not wait on a disk
+        chunk = self.file.read(CHUNK_SIZE) if self.temp_dir is not None else b''
+        if not chunk:
+            self.close()
+            raise StopAsyncIteration
+        return chunk
+
+    async def aclose(self):
+        self.close()
+
+    def close(self):
+        if self.temp_dir is None: return
+        temp_dir, self.temp_dir = self.temp_dir, None
+        self.file.close()
+        release_slot(temp_dir)
+
+    __del__ = close
+
 @app.route('/process', methods=['POST'])
-def process_video():
-    # Create temp directory
-    with tempfile.TemporaryDirectory() as temp_dir:
+async def process_video():
+    # Borrow a working directory from the pool
+    temp_dir = await slots.get()
+    output_dir = os.path.join(temp_dir, 'output')
+    job = None
+    try:
         # Save received video
         video_path = os.path.join(temp_dir, 'input.mp4')
-        request.files['video'].save(video_path)
-        
-        # Process with WHAM
-        output_dir = os.path.join(temp_dir, 'output')
-        success, _, _ = wham_processor.process_video(
-            video_path,
-            output_pth=output_dir
-        )
-        wham_processor.wait_until_complete()
-        
-        # Return processed video
-        output_path = os.path.join(output_dir, 'input_vis.mp4')
-        return send_file(output_path, mimetype='video/mp4')
+        files = await request.files
+        await files['video'].save(video_path)
+
+        # Process with WHAM (blocking, in a worker thread off the event loop).
+        # Shielded, so a client disconnect cancels only this handler and not the wait on the job
+        job = await run_wham(video_path, output_dir)
+        success, output, error = await asyncio.shield(job)
+        if not success:
+            app.logger.error(error)
+            release_slot(temp_dir)
+            return 'WHAM processing failed', 500
+
+        output_path = os.path.join(output, 'output.mp4')
+        size = os.path.getsize(output_path)
+        body = SlotStream(output_path, temp_dir)
+    except BaseException:
+        if job is not None and not job.done():
+            # WHAM still reads input.mp4 and writes output/, so keep the slot until it finishes
+            job.add_done_callback(lambda _: release_slot(temp_dir))
+        else:
+            release_slot(temp_dir)
+        raise
+
+    # Stream processed video in chunks
+    response = Response(body, mimetype='video/mp4')
+    response.headers['Content-Length'] = str(size)
+    return response
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file
+    # Development server. For deployment use an ASGI server, e.g.
+    #   hypercorn wham_server:app --bind 0.0.0.0:5000
+    # Every worker process loads its own WHAM models, so run one worker per GPU.
+    app.run(host='0.0.0.0', port=5000)